@@ -1,36 +1,336 @@
 import json                      # For handling JSON data (reading and writing)
+import os                        # For CPU count, environment variables and low-level file operations
+import errno                     # For recognizing moves across filesystems
 import subprocess                # For running external commands (like ImageMagick and ExifTool)
 from pathlib import Path         # For object-oriented filesystem paths
 import shutil                    # For high-level file operations (copying and moving files)
-from concurrent.futures import ThreadPoolExecutor, as_completed  # For concurrent execution of functions
+import tempfile                  # For writing metadata files under a temporary name first
+import itertools                 # For counting up candidate file names
+from functools import lru_cache  # For remembering which directories already exist
+import sqlite3                   # For the on-disk metadata cache
+import argparse                  # For parsing command-line options
+import threading                 # For discovering files in a background thread
+import queue                     # For handing discovered files from the background thread to the main thread
+import multiprocessing           # For starting the worker processes without forking this multi-threaded process
+import base64                    # For decoding binary metadata values returned by ExifTool
+import zlib                      # For decompressing compressed PNG text chunks
+from concurrent.futures import ProcessPoolExecutor  # For running files through parallel worker processes
+from concurrent.futures import ThreadPoolExecutor   # For saving metadata while the image is being encoded
+from concurrent.futures import wait, FIRST_COMPLETED, Future  # For waiting until a worker is free before submitting more files
 from tqdm import tqdm            # For displaying progress bars during iterations
-from typing import Dict, Any     # For type hinting dictionaries with any type of values
+from typing import Dict, Any, List, Iterator, Tuple, Optional, BinaryIO  # For type hinting
 
 # Constants for image conversion settings
 IMAGE_QUALITY = 90       # Quality setting for image conversion (0-100); higher means better quality
 AVIF_SPEED = 0           # Compression speed for AVIF format (0-10); lower is slower but better compression
+# AVIF encoder: "pyvips", "pillow", "wand" or "magick"; "auto" uses the first one that is installed, in that order
+AVIF_ENCODER = "auto"
 
-def check_dependencies() -> None:
+# Parallelism settings
+MAX_WORKERS = None       # Number of worker processes encoding files in parallel (None uses one per CPU)
+# CPUs this process may run on (respects affinity limits, e.g. in containers), falling back to all CPUs
+CPU_COUNT = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+# Worker processes to start; AVIF encoding is CPU-bound, so one per usable CPU (Windows allows at most 61)
+WORKER_COUNT = MAX_WORKERS or (min(CPU_COUNT, 61) if os.name == "nt" else CPU_COUNT)
+# Threads each individual AVIF encode may use, so that workers x threads matches the CPU count
+ENCODE_THREADS = max(1, CPU_COUNT // WORKER_COUNT)
+# Maximum number of discovered PNG files waiting to be handed to the workers
+DISCOVERY_QUEUE_SIZE = 1024
+# Maximum number of files whose metadata is read (and requested from ExifTool) in a single batch
+EXIFTOOL_BATCH_SIZE = 64
+# Seconds to wait for finished files while no new file is ready, before checking for new files again
+COMPLETION_POLL_INTERVAL = 0.1
+# Bytes at the start of each PNG (where its text metadata lives) to prefetch before it is read
+PREFETCH_BYTES = 64 * 1024
+# Metadata tags that are extracted from each image, named the way ExifTool names them
+METADATA_TAGS = ("Workflow", "Parameters")
+# The 8 bytes every PNG file starts with
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# libvips reads its thread count when it is first loaded, so set it before importing pyvips
+os.environ.setdefault("VIPS_CONCURRENCY", str(ENCODE_THREADS))
+
+try:
+    import pyvips                # Optional: encode AVIF in-process with libvips instead of starting ImageMagick per file
+except (ImportError, OSError):
+    # pyvips is not installed (or libvips could not be loaded); another encoder is used
+    pyvips = None
+
+try:
+    # Optional: encode AVIF in-process with Pillow and the pillow-avif-plugin
+    from PIL import Image as PILImage
+    import pillow_avif           # Registers the AVIF codec with Pillow
+except ImportError:
+    # Pillow or the AVIF plugin is not installed
+    PILImage = None
+
+try:
+    # Optional: run ImageMagick in-process through MagickWand instead of starting 'magick' per file
+    from wand.image import Image as WandImage
+    from wand.exceptions import WandException
+    from wand.resource import limits as wand_limits
+except ImportError:
+    # Wand is not installed (or MagickWand could not be loaded); another encoder is used
+    WandImage = None
+
+try:
+    import orjson                # Optional: much faster JSON parsing and writing for large workflows
+except ImportError:
+    # orjson is not installed; use the standard library json module
+    orjson = None
+
+# File caching the extracted metadata, so unchanged files are not read again on later runs
+METADATA_CACHE_PATH = Path.home() / ".extract_comfyui_workflow_cache.sqlite"
+
+# Per-worker state, set up once in each worker process by _init_worker()
+_root_folder: Path = None                 # Root directory containing all images
+_review_folder: Path = None               # Directory the original PNG files are moved to
+_pretty_json: bool = False                # Whether workflows are re-indented instead of saved as-is
+
+# Absolute paths of the external tools, resolved once by check_dependencies() (and passed on to
+# the workers), so starting a tool does not search the PATH each time
+TOOL_PATHS: Dict[str, str] = {}
+
+def json_loads(data: str) -> Any:
+    """
+    Parse JSON text, using orjson when it is installed.
+
+    Args:
+        data (str): The JSON text.
+
+    Returns:
+        Any: The parsed data.
+
+    Raises:
+        json.JSONDecodeError: If the text is not valid JSON (orjson's error is a subclass).
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps(data: Any, indent: bool = True) -> bytes:
+    """
+    Serialize data as UTF-8 JSON, using orjson when it is installed.
+
+    Both variants indent with 2 spaces (the only indentation orjson supports) so the output
+    is the same either way.
+
+    Args:
+        data (Any): The data to serialize.
+        indent (bool): Whether to pretty-print the JSON; compact output is smaller and faster
+            to produce when nobody reads it.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON.
+
+    Raises:
+        TypeError: If the data is not JSON-serializable (orjson's error is a subclass).
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else None)
+    if indent:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def get_avif_encoder() -> str:
+    """
+    Determine which AVIF encoder to use.
+
+    Returns:
+        str: AVIF_ENCODER if it names an encoder, otherwise ("auto") the first installed of
+        pyvips, Pillow and Wand, falling back to the 'magick' command.
+    """
+    if AVIF_ENCODER != "auto":
+        return AVIF_ENCODER
+    if pyvips is not None:
+        return "pyvips"
+    if PILImage is not None:
+        return "pillow"
+    if WandImage is not None:
+        return "wand"
+    return "magick"
+
+def check_dependencies() -> Dict[str, str]:
     """
-    Check that required external tools are installed and available in the system PATH.
+    Check that the selected AVIF encoder and the required external tools are available.
 
     Required tools:
-        - ImageMagick ('magick' command)
-        - ExifTool ('exiftool' command)
+        - ImageMagick ('magick' command), when it is the AVIF encoder
+
+    ExifTool is optional: the metadata is read from the PNG text chunks directly, and ExifTool is
+    only started for files that cannot be parsed that way.
+
+    Returns:
+        Dict[str, str]: The absolute path of each tool that was found, keyed by its command name.
 
     Raises:
-        EnvironmentError: If any of the required tools are not found in the system PATH.
+        EnvironmentError: If the encoder is unknown or not installed, or any of the required
+        tools are not found in the system PATH.
     """
+    encoder = get_avif_encoder()
+    # Python libraries needed by each in-process encoder
+    encoder_libraries = {"pyvips": pyvips, "pillow": PILImage, "wand": WandImage}
+    if encoder != "magick" and encoder not in encoder_libraries:
+        raise EnvironmentError(f"Unknown AVIF encoder: {encoder}")
+    if encoder_libraries.get(encoder, True) is None:
+        raise EnvironmentError(f"The {encoder} AVIF encoder is not installed.")
     # List of required external tools
-    required_tools = ["magick", "exiftool"]
-    # Iterate over each tool to check its availability
-    for tool in required_tools:
+    required_tools = []
+    if encoder == "magick":
+        required_tools.append("magick")
+    tool_paths = {}
+    # Iterate over each tool to check its availability (ExifTool is looked up too, but optional)
+    for tool in required_tools + ["exiftool"]:
         # shutil.which() returns the path to the executable or None if not found
-        if shutil.which(tool) is None:
+        tool_path = shutil.which(tool)
+        if tool_path is not None:
+            tool_paths[tool] = os.path.abspath(tool_path)
+        elif tool in required_tools:
             # Raise an error if the tool is not found
             raise EnvironmentError(f"{tool} is not installed or not in the system PATH.")
+    return tool_paths
+
+def tool_path(tool: str) -> str:
+    """
+    Get the command to start an external tool with.
+
+    Args:
+        tool (str): The command name of the tool (e.g. 'magick').
+
+    Returns:
+        str: The absolute path resolved by check_dependencies(), or the command name itself
+        (searched in the PATH when started) if it was not resolved.
+    """
+    return TOOL_PATHS.get(tool, tool)
 
 def compress_to_avif(png_path: Path, avif_path: Path) -> bool:
+    """
+    Convert a PNG image to AVIF format.
+
+    Uses the encoder selected by get_avif_encoder(): libvips, Pillow or ImageMagick through Wand
+    in-process, or the 'magick' command. The encoder writes to a hidden temporary file next to
+    the output, which is renamed to avif_path only once the encode has succeeded, so a failed or
+    interrupted encode never leaves a partial AVIF file that looks like a finished one.
+
+    Args:
+        png_path (Path): Path to the input PNG file.
+        avif_path (Path): Path where the output AVIF file will be saved.
+
+    Returns:
+        bool: True if the conversion was successful, False otherwise.
+    """
+    # Keep the .avif extension, which the 'magick' command uses to pick the output format
+    partial_path = avif_path.with_name(f".{avif_path.stem}.partial.avif")
+    encoder = get_avif_encoder()
+    converted = False
+    try:
+        if encoder == "pyvips":
+            encoded = compress_to_avif_pyvips(png_path, partial_path)
+        elif encoder == "pillow":
+            encoded = compress_to_avif_pillow(png_path, partial_path)
+        elif encoder == "wand":
+            encoded = compress_to_avif_wand(png_path, partial_path)
+        else:
+            encoded = compress_to_avif_magick(png_path, partial_path)
+        if encoded:
+            # Put the finished file in place with a single rename
+            os.replace(partial_path, avif_path)
+            converted = True
+    finally:
+        if not converted:
+            try:
+                # Remove whatever the failed encode left behind
+                os.unlink(partial_path)
+            except OSError:
+                # The encoder failed before writing anything (or the file cannot be removed, which
+                # should not hide the original error; it is overwritten by the next attempt)
+                pass
+    return converted
+
+def compress_to_avif_pyvips(png_path: Path, avif_path: Path) -> bool:
+    """
+    Convert a PNG image to AVIF format in-process using libvips.
+
+    Args:
+        png_path (Path): Path to the input PNG file.
+        avif_path (Path): Path where the output AVIF file will be saved.
+
+    Returns:
+        bool: True if the conversion was successful, False otherwise.
+    """
+    try:
+        # Load the PNG and save it through libheif with the AV1 codec
+        image = pyvips.Image.new_from_file(str(png_path))
+        image.heifsave(
+            str(avif_path),
+            Q=IMAGE_QUALITY,                       # Set the image quality
+            compression="av1",                     # AVIF is HEIF with AV1 compression
+            effort=9 - min(AVIF_SPEED, 9),         # libvips effort runs the other way (9 is slowest)
+        )
+        # If the encode succeeds, return True
+        return True
+    except pyvips.Error as e:
+        # If the encode fails, print an error message with details
+        print(f"Error compressing {png_path} to AVIF: {e}")
+        # Return False to indicate failure
+        return False
+
+def compress_to_avif_pillow(png_path: Path, avif_path: Path) -> bool:
+    """
+    Convert a PNG image to AVIF format in-process using Pillow and the pillow-avif-plugin.
+
+    Args:
+        png_path (Path): Path to the input PNG file.
+        avif_path (Path): Path where the output AVIF file will be saved.
+
+    Returns:
+        bool: True if the conversion was successful, False otherwise.
+    """
+    try:
+        # Load the PNG and save it as AVIF
+        with PILImage.open(png_path) as image:
+            image.save(
+                avif_path,
+                format="AVIF",
+                quality=IMAGE_QUALITY,             # Set the image quality
+                speed=AVIF_SPEED,                  # Set the AVIF compression speed
+                max_threads=ENCODE_THREADS,        # Limit the threads used by this encode
+            )
+        # If the encode succeeds, return True
+        return True
+    except OSError as e:
+        # If the encode fails, print an error message with details
+        print(f"Error compressing {png_path} to AVIF: {e}")
+        # Return False to indicate failure
+        return False
+
+def compress_to_avif_wand(png_path: Path, avif_path: Path) -> bool:
+    """
+    Convert a PNG image to AVIF format in-process using ImageMagick through Wand.
+
+    Args:
+        png_path (Path): Path to the input PNG file.
+        avif_path (Path): Path where the output AVIF file will be saved.
+
+    Returns:
+        bool: True if the conversion was successful, False otherwise.
+    """
+    try:
+        # Load the PNG and save it as AVIF with the same settings as the 'magick' command
+        with WandImage(filename=str(png_path)) as image:
+            image.compression_quality = IMAGE_QUALITY          # Set the image quality
+            image.options["avif:speed"] = str(AVIF_SPEED)      # Set the AVIF compression speed
+            image.format = "avif"                              # Encode as AVIF
+            image.save(filename=str(avif_path))
+        # If the encode succeeds, return True
+        return True
+    except WandException as e:
+        # If the encode fails, print an error message with details
+        print(f"Error compressing {png_path} to AVIF: {e}")
+        # Return False to indicate failure
+        return False
+
+def compress_to_avif_magick(png_path: Path, avif_path: Path) -> bool:
     """
     Convert a PNG image to AVIF format using ImageMagick.
 
@@ -45,150 +345,636 @@ def compress_to_avif(png_path: Path, avif_path: Path) -> bool:
         # Run the ImageMagick 'magick' command to convert the image
         subprocess.run(
             [
-                "magick",                          # Command to run
+                tool_path("magick"),               # Command to run
                 str(png_path),                     # Input PNG file
                 "-quality", str(IMAGE_QUALITY),    # Set the image quality
                 "-define", f"avif:speed={AVIF_SPEED}",  # Set the AVIF compression speed
+                "-limit", "thread", str(ENCODE_THREADS),  # Limit the threads used by this encode
                 str(avif_path),                    # Output AVIF file
             ],
             check=True,                            # Raise an exception if the command fails
-            stdout=subprocess.PIPE,                # Capture standard output (not used here)
-            stderr=subprocess.PIPE,                # Capture standard error (for error messages)
+            stdout=subprocess.DEVNULL,             # Discard standard output (not used here)
+            stderr=subprocess.PIPE,                # Capture standard error (shown if the command fails)
         )
         # If the command succeeds, return True
         return True
     except subprocess.CalledProcessError as e:
-        # If the command fails, print an error message with details
-        print(f"Error compressing {png_path} to AVIF: {e}")
+        # If the command fails, print an error message with details, including ImageMagick's own message
+        details = e.stderr.decode("utf-8", errors="replace").strip() if e.stderr else ""
+        print(f"Error compressing {png_path} to AVIF: {e}" + (f"\n{details}" if details else ""))
         # Return False to indicate failure
         return False
 
-def extract_metadata(image_path: Path) -> Dict[str, Any]:
+class ExifToolSession:
     """
-    Extract metadata from an image using ExifTool.
+    A single persistent ExifTool process running in '-stay_open' mode.
 
-    Args:
-        image_path (Path): Path to the image file.
-
-    Returns:
-        Dict[str, Any]: A dictionary containing the image metadata.
-
-    ---
-
-    Example of Exiftool output for a PNG that contains a comfyui workflow:
-
-    [Example Start]
-    C:\\Photos>exiftool ComfyUI_00003_.png
-    ExifTool Version Number         : 13.03
-    File Name                       : ComfyUI_00003_.png
-    Directory                       : .
-    File Size                       : 1196 kB
-    File Modification Date/Time     : 2024:10:21 01:53:16-04:00
-    File Access Date/Time           : 2024:11:18 19:22:49-05:00
-    File Creation Date/Time         : 2024:11:18 00:24:09-05:00
-    File Permissions                : -rw-rw-rw-
-    File Type                       : PNG
-    File Type Extension             : png
-    MIME Type                       : image/png
-    Image Width                     : 768
-    Image Height                    : 1344
-    Bit Depth                       : 8
-    Color Type                      : RGB
-    Compression                     : Deflate/Inflate
-    Filter                          : Adaptive
-    Interlace                       : Noninterlaced
-    Prompt                          : {"6": {"inputs": {"text": "photo of a man.", "clip": ["50", 1]}, "class_type": "CLIPTextEncode"}, "8": {"inputs": {"samples": ["13", 0], "vae": ["10", 0]}, "class_type": "VAEDecode"}, "9": {"inputs": {"filename_prefix": "ComfyUI", "images": ["8", 0]}, "class_type": "SaveImage"}, "10": {"inputs": {"vae_name": "FLUX1\\ae.safetensors"}, "class_type": "VAELoader"}, "13": {"inputs": {"noise": ["25", 0], "guider": ["22", 0], "sampler": ["16", 0], "sigmas": ["17", 0], "latent_image": ["27", 0]}, "class_type": "SamplerCustomAdvanced"}, "16": {"inputs": {"sampler_name": "euler"}, "class_type": "KSamplerSelect"}, "17": {"inputs": {"scheduler": "normal", "steps": 8, "denoise": 1.0, "model": ["50", 0]}, "class_type": "BasicScheduler"}, "22": {"inputs": {"model": ["50", 0], "conditioning": ["26", 0]}, "class_type": "BasicGuider"}, "25": {"inputs": {"noise_seed": 976408652294932}, "class_type": "RandomNoise"}, "26": {"inputs": {"guidance": 3.5, "conditioning": ["6", 0]}, "class_type": "FluxGuidance"}, "27": {"inputs": {"width": 768, "height": 1344, "batch_size": 1}, "class_type": "EmptySD3LatentImage"}, "46": {"inputs": {"unet_name": "FLUX1\\flux1-dev.safetensors", "weight_dtype": "fp8_e4m3fn_fast"}, "class_type": "UNETLoader"}, "47": {"inputs": {"clip_name1": "ViT-L-14-TEXT-detail-improved-hiT-GmP-TE-only-HF.safetensors", "clip_name2": "t5\\google_t5-v1_1-xxl_encoderonly-fp16.safetensors", "type": "flux"}, "class_type": "DualCLIPLoader"}, "50": {"inputs": {"PowerLoraLoaderHeaderWidget": {"type": "PowerLoraLoaderHeaderWidget"}, "lora_1": {"on": true, "lora": "Turbo\\flux_turbo.safetensors", "strength": 1}, "\u2795 Add Lora": "", "model": ["46", 0], "clip": ["47", 0]}, "class_type": "Power Lora Loader (rgthree)"}}
-    Workflow                        : {"last_node_id": 51, "last_link_id": 142, "nodes": [{"id": 9, "type": "SaveImage", "pos": {"0": 1112, "1": 117}, "size": {"0": 736.6519165039062, "1": 907.8062744140625}, "flags": {}, "order": 18, "mode": 0, "inputs": [{"name": "images", "type": "IMAGE", "link": 9}], "outputs": [], "properties": {"Node name for S&R": "SaveImage"}, "widgets_values": ["ComfyUI"]}, {"id": 26, "type": "FluxGuidance", "pos": {"0": 390, "1": 138}, "size": {"0": 317.4000244140625, "1": 58}, "flags": {}, "order": 14, "mode": 0, "inputs": [{"name": "conditioning", "type": "CONDITIONING", "link": 41}], "outputs": [{"name": "CONDITIONING", "type": "CONDITIONING", "links": [42], "slot_index": 0, "shape": 3}], "properties": {"Node name for S&R": "FluxGuidance"}, "widgets_values": [3.5], "color": "#233", "bgcolor": "#355"}, {"id": 35, "type": "PrimitiveNode", "pos": {"0": 620, "1": 484}, "size": {"0": 210, "1": 82}, "flags": {}, "order": 0, "mode": 0, "inputs": [], "outputs": [{"name": "INT", "type": "INT", "links": [113, 114], "slot_index": 0, "widget": {"name": "height"}}], "title": "height", "properties": {"Run widget replace on values": false}, "widgets_values": [1344, "fixed"], "color": "#323", "bgcolor": "#535"}, {"id": 34, "type": "PrimitiveNode", "pos": {"0": 394, "1": 477}, "size": {"0": 210.0775909423828, "1": 94.05860900878906}, "flags": {}, "order": 1, "mode": 0, "inputs": [], "outputs": [{"name": "INT", "type": "INT", "links": [112, 115], "slot_index": 0, "widget": {"name": "width"}}], "title": "width", "properties": {"Run widget replace on values": false}, "widgets_values": [768, "fixed"], "color": "#323", "bgcolor": "#535"}, {"id": 22, "type": "BasicGuider", "pos": {"0": 729, "1": 142}, "size": {"0": 222.3482666015625, "1": 46}, "flags": {}, "order": 15, "mode": 0, "inputs": [{"name": "model", "type": "MODEL", "link": 54, "slot_index": 0}, {"name": "conditioning", "type": "CONDITIONING", "link": 42, "slot_index": 1}], "outputs": [{"name": "GUIDER", "type": "GUIDER", "links": [30], "slot_index": 0, "shape": 3}], "properties": {"Node name for S&R": "BasicGuider"}, "widgets_values": []}, {"id": 27, "type": "EmptySD3LatentImage", "pos": {"0": 399, "1": 616}, "size": {"0": 424.8544006347656, "1": 99.15755462646484}, "flags": {}, "order": 9, "mode": 0, "inputs": [{"name": "width", "type": "INT", "link": 112, "widget": {"name": "width"}}, {"name": "height", "type": "INT", "link": 113, "widget": {"name": "height"}}], "outputs": [{"name": "LATENT", "type": "LATENT", "links": [116], "slot_index": 0, "shape": 3}], "properties": {"Node name for S&R": "EmptySD3LatentImage"}, "widgets_values": [768, 1344, 1]}, {"id": 25, "type": "RandomNoise", "pos": {"0": 404, "1": 761}, "size": {"0": 412.7810363769531, "1": 82}, "flags": {}, "order": 2, "mode": 0, "inputs": [], "outputs": [{"name": "NOISE", "type": "NOISE", "links": [37], "shape": 3}], "properties": {"Node name for S&R": "RandomNoise"}, "widgets_values": [976408652294932, "randomize"], "color": "#2a363b", "bgcolor": "#3f5159"}, {"id": 17, "type": "BasicScheduler", "pos": {"0": 413, "1": 1007}, "size": {"0": 398.4141845703125, "1": 106}, "flags": {}, "order": 11, "mode": 0, "inputs": [{"name": "model", "type": "MODEL", "link": 141, "slot_index": 0}], "outputs": [{"name": "SIGMAS", "type": "SIGMAS", "links": [20], "shape": 3}], "properties": {"Node name for S&R": "BasicScheduler"}, "widgets_values": ["normal", 8, 1]}, {"id": 16, "type": "KSamplerSelect", "pos": {"0": 408, "1": 896}, "size": {"0": 394.4875793457031, "1": 58.668025970458984}, "flags": {}, "order": 3, "mode": 0, "inputs": [], "outputs": [{"name": "SAMPLER", "type": "SAMPLER", "links": [19], "shape": 3}], "properties": {"Node name for S&R": "KSamplerSelect"}, "widgets_values": ["euler"]}, {"id": 30, "type": "ModelSamplingFlux", "pos": {"0": 425, "1": 1158}, "size": {"0": 382.2674560546875, "1": 124.22319030761719}, "flags": {}, "order": 12, "mode": 4, "inputs": [{"name": "model", "type": "MODEL", "link": 142, "slot_index": 0}, {"name": "width", "type": "INT", "link": 115, "slot_index": 1, "widget": {"name": "width"}}, {"name": "height", "type": "INT", "link": 114, "slot_index": 2, "widget": {"name": "height"}}], "outputs": [{"name": "MODEL", "type": "MODEL", "links": [54], "slot_index": 0, "shape": 3}], "properties": {"Node name for S&R": "ModelSamplingFlux"}, "widgets_values": [1.15, 0.5, 768, 1344]}, {"id": 37, "type": "Note", "pos": {"0": 826, "1": 1160}, "size": {"0": 314.99755859375, "1": 117.98363494873047}, "flags": {}, "order": 4, "mode": 0, "inputs": [], "outputs": [], "properties": {"text": ""}, "widgets_values": ["The reference sampling implementation auto adjusts the shift value based on the resolution, if you don't want this you can just bypass (CTRL-B) this ModelSamplingFlux node.\n"], "color": "#432", "bgcolor": "#653"}, {"id": 13, "type": "SamplerCustomAdvanced", "pos": {"0": 827, "1": 239}, "size": {"0": 236.8000030517578, "1": 128.12550354003906}, "flags": {}, "order": 16, "mode": 0, "inputs": [{"name": "noise", "type": "NOISE", "link": 37, "slot_index": 0}, {"name": "guider", "type": "GUIDER", "link": 30, "slot_index": 1}, {"name": "sampler", "type": "SAMPLER", "link": 19, "slot_index": 2}, {"name": "sigmas", "type": "SIGMAS", "link": 20, "slot_index": 3}, {"name": "latent_image", "type": "LATENT", "link": 116, "slot_index": 4}], "outputs": [{"name": "output", "type": "LATENT", "links": [24], "slot_index": 0, "shape": 3}, {"name": "denoised_output", "type": "LATENT", "links": null, "shape": 3}], "properties": {"Node name for S&R": "SamplerCustomAdvanced"}, "widgets_values": []}, {"id": 8, "type": "VAEDecode", "pos": {"0": 832, "1": 407}, "size": {"0": 233.40155029296875, "1": 46}, "flags": {}, "order": 17, "mode": 0, "inputs": [{"name": "samples", "type": "LATENT", "link": 24}, {"name": "vae", "type": "VAE", "link": 12}], "outputs": [{"name": "IMAGE", "type": "IMAGE", "links": [9], "slot_index": 0}], "properties": {"Node name for S&R": "VAEDecode"}, "widgets_values": []}, {"id": 51, "type": "Note", "pos": {"0": 329, "1": -95}, "size": {"0": 463.29266357421875, "1": 166.00962829589844}, "flags": {}, "order": 5, "mode": 0, "inputs": [], "outputs": [], "properties": {}, "widgets_values": ["     \u2588\u2588\u2557 \u2588\u2588\u2588\u2588\u2588\u2588\u2557  \u2588\u2588\u2588\u2588\u2588\u2588\u2557\u2588\u2588\u2557  \u2588\u2588\u2557\u2588\u2588\u2588\u2588\u2588\u2588\u2588\u2557\u2588\u2588\u2588\u2588\u2588\u2588\u2557     \u2588\u2588\u2588\u2588\u2588\u2557 \u2588\u2588\u2557\n     \u2588\u2588\u2551\u2588\u2588\u2554\u2550\u2550\u2550\u2588\u2588\u2557\u2588\u2588\u2554\u2550\u2550\u2550\u2550\u255d\u2588\u2588\u2551 \u2588\u2588\u2554\u255d\u2588\u2588\u2554\u2550\u2550\u2550\u2550\u255d\u2588\u2588\u2554\u2550\u2550\u2588\u2588\u2557   \u2588\u2588\u2554\u2550\u2550\u2588\u2588\u2557\u2588\u2588\u2551\n     \u2588\u2588\u2551\u2588\u2588\u2551   \u2588\u2588\u2551\u2588\u2588\u2551     \u2588\u2588\u2588\u2588\u2588\u2554\u255d \u2588\u2588\u2588\u2588\u2588\u2557  \u2588\u2588\u2588\u2588\u2588\u2588\u2554\u255d   \u2588\u2588\u2588\u2588\u2588\u2588\u2588\u2551\u2588\u2588\u2551\n\u2588\u2588   \u2588\u2588\u2551\u2588\u2588\u2551   \u2588\u2588\u2551\u2588\u2588\u2551     \u2588\u2588\u2554\u2550\u2588\u2588\u2557 \u2588\u2588\u2554\u2550\u2550\u255d  \u2588\u2588\u2554\u2550\u2550\u2588\u2588\u2557   \u2588\u2588\u2554\u2550\u2550\u2588\u2588\u2551\u2588\u2588\u2551\n\u255a\u2588\u2588\u2588\u2588\u2588\u2554\u255d\u255a\u2588\u2588\u2588\u2588\u2588\u2588\u2554\u255d\u255a\u2588\u2588\u2588\u2588\u2588\u2588\u2557\u2588\u2588\u2551  \u2588\u2588\u2557\u2588\u2588\u2588\u2588\u2588\u2588\u2588\u2557\u2588\u2588\u2551  \u2588\u2588\u2551\u2588\u2588\u2557\u2588\u2588\u2551  \u2588\u2588\u2551\u2588\u2588\u2551\n \u255a\u2550\u2550\u2550\u2550\u255d  \u255a\u2550\u2550\u2550\u2550\u2550\u255d  \u255a\u2550\u2550\u2550\u2550\u2550\u255d\u255a\u2550\u255d  \u255a\u2550\u255d\u255a\u2550\u2550\u2550\u2550\u2550\u2550\u255d\u255a\u2550\u255d  \u255a\u2550\u255d\u255a\u2550\u255d\u255a\u2550\u255d  \u255a\u2550\u255d\u255a\u2550\u255d\n
-                                    \nhttps://instagram.com/"], "color": "#432", "bgcolor": "#653"}, {"id": 47, "type": "DualCLIPLoader", "pos": {"0": -322, "1": 296}, "size": {"0": 312.69696044921875, "1": 106}, "flags": {}, "order": 6, "mode": 0, "inputs": [], "outputs": [{"name": "CLIP", "type": "CLIP", "links": [139], "slot_index": 0, "shape": 3}], "properties": {"Node name for S&R": "DualCLIPLoader"}, "widgets_values": ["ViT-L-14-TEXT-detail-improved-hiT-GmP-TE-only-HF.safetensors", "t5\\google_t5-v1_1-xxl_encoderonly-fp16.safetensors", "flux"]}, {"id": 10, "type": "VAELoader", "pos": {"0": 30, "1": 177}, "size": {"0": 319.9231872558594, "1": 60.98368453979492}, "flags": {}, "order": 7, "mode": 0, "inputs": [], "outputs": [{"name": "VAE", "type": "VAE", "links": [12], "slot_index": 0, "shape": 3}], "properties": {"Node name for S&R": "VAELoader"}, "widgets_values": ["FLUX1\\ae.safetensors"]}, {"id": 50, "type": "Power Lora Loader (rgthree)", "pos": {"0": 19, "1": 288}, "size": {"0": 334.2002868652344, "1": 142}, "flags": {}, "order": 10, "mode": 0, "inputs": [{"name": "model", "type": "MODEL", "link": 138, "dir": 3}, {"name": "clip", "type": "CLIP", "link": 139, "dir": 3}], "outputs": [{"name": "MODEL", "type": "MODEL", "links": [141, 142], "slot_index": 0, "shape": 3, "dir": 4}, {"name": "CLIP", "type": "CLIP", "links": [140], "slot_index": 1, "shape": 3, "dir": 4}], "properties": {"Show Strengths": "Single Strength"}, "widgets_values": [null, {"type": "PowerLoraLoaderHeaderWidget"}, {"on": true, "lora": "Turbo\\flux_turbo.safetensors", "strength": 1, "strengthTwo": null}, null, ""]}, {"id": 46, "type": "UNETLoader", "pos": {"0": -319, "1": 166}, "size": {"0": 315, "1": 82}, "flags": {}, "order": 8, "mode": 0, "inputs": [], "outputs": [{"name": "MODEL", "type": "MODEL", "links": [138], "slot_index": 0, "shape": 3}], "properties": {"Node name for S&R": "UNETLoader"}, "widgets_values": ["FLUX1\\flux1-dev.safetensors", "fp8_e4m3fn_fast"]}, {"id": 6, "type": "CLIPTextEncode", "pos": {"0": 384, "1": 240}, "size": {"0": 428.4508972167969, "1": 207.69332885742188}, "flags": {}, "order": 13, "mode": 0, "inputs": [{"name": "clip", "type": "CLIP", "link": 140}], "outputs": [{"name": "CONDITIONING", "type": "CONDITIONING", "links": [41], "slot_index": 0}], "title": "CLIP Text Encode (Positive Prompt)", "properties": {"Node name for S&R": "CLIPTextEncode"}, "widgets_values": ["photo of a man."], "color": "#232", "bgcolor": "#353"}], "links": [[9, 8, 0, 9, 0, "IMAGE"], [12, 10, 0, 8, 1, "VAE"], [19, 16, 0, 13, 2, "SAMPLER"], [20, 17, 0, 13, 3, "SIGMAS"], [24, 13, 0, 8, 0, "LATENT"], [30, 22, 0, 13, 1, "GUIDER"], [37, 25, 0, 13, 0, "NOISE"], [41, 6, 0, 26, 0, "CONDITIONING"], [42, 26, 0, 22, 1, "CONDITIONING"], [54, 30, 0, 22, 0, "MODEL"], [112, 34, 0, 27, 0, "INT"], [113, 35, 0, 27, 1, "INT"], [114, 35, 0, 30, 2, "INT"], [115, 34, 0, 30, 1, "INT"], [116, 27, 0, 13, 4, "LATENT"], [138, 46, 0, 50, 0, "MODEL"], [139, 47, 0, 50, 1, "CLIP"], [140, 50, 1, 6, 0, "CLIP"], [141, 50, 0, 17, 0, "MODEL"], [142, 50, 0, 30, 0, "MODEL"]], "groups": [], "config": {}, "extra": {"ds": {"scale": 0.7513148009015777, "offset": [633.1895566406254, -41.92843025346228]}, "groupNodes": {}}, "version": 0.4}
-    Image Size                      : 768x1344
-    Megapixels                      : 1.0
-    [Example End]
-
-    ---
+    Starting ExifTool costs far more than reading the metadata of one PNG, so instead of
+    launching a new process per image, one process is started for the whole run and batches
+    of file names are fed to it over stdin. Each request is terminated with '-execute<N>', and
+    ExifTool answers with its JSON output followed by a '{ready<N>}' line, where N numbers the
+    requests so the output of one can never be mistaken for another's. The process is only
+    started by the first request, so a run that never needs ExifTool never starts it.
 
+    Use it as a context manager so the process is shut down cleanly:
+
+        with ExifToolSession() as session:
+            metadata_by_path = session.get_tags(image_paths)
     """
-    try:
-        # Run ExifTool to extract metadata in JSON format
-        result = subprocess.run(
-            ["exiftool", "-j", str(image_path)],   # Command and arguments
-            stdout=subprocess.PIPE,                # Capture standard output
-            stderr=subprocess.PIPE,                # Capture standard error
-            text=True,                             # Return output as strings (not bytes)
+
+    def __init__(self) -> None:
+        self._process = None               # The running ExifTool process (started by the first request)
+        self._request_numbers = itertools.count(1)  # Numbers identifying each request's output
+
+    def __enter__(self) -> "ExifToolSession":
+        return self
+
+    def _start(self) -> None:
+        # Start ExifTool once; it keeps running and reads its arguments from stdin
+        self._process = subprocess.Popen(
+            [
+                tool_path("exiftool"),             # Command to run
+                "-stay_open", "True",              # Keep running after each request
+                "-@", "-",                         # Read arguments from standard input
+                "-common_args",                    # Everything below applies to every request
+                "-j",                              # Output metadata as JSON
+                "-b",                              # Output values in full, never as '(Binary data ...)' placeholders
+                "-fast2",                          # Only read the header, not the whole file
+                "-q", "-m",                        # Quiet, and ignore minor errors in damaged files
+                "-charset", "filename=utf8",       # File names are sent as UTF-8
+                *(f"-{tag}" for tag in METADATA_TAGS),  # Only extract the tags we actually use
+            ],
+            stdin=subprocess.PIPE,                 # File names are written to stdin
+            stdout=subprocess.PIPE,                # Metadata is read back from stdout
+            stderr=subprocess.DEVNULL,             # Errors surface as missing metadata instead
+            text=True,                             # Exchange strings (not bytes)
+            encoding="utf-8",                      # ExifTool writes JSON as UTF-8
         )
-        # Check if ExifTool ran successfully
-        if result.returncode != 0:
-            # If ExifTool failed, print the error message
-            print(f"ExifTool error for {image_path}: {result.stderr}")
-            # Return an empty dictionary to signify failure
+
+    def __exit__(self, *exc_info) -> None:
+        if self._process is None:
+            # ExifTool was never needed, so there is nothing to shut down
+            return
+        # Ask ExifTool to exit and wait for it to finish
+        self._process.stdin.write("-stay_open\nFalse\n")
+        self._process.stdin.flush()
+        self._process.stdin.close()
+        self._process.wait()
+
+    def get_tags(self, image_paths: List[Path]) -> Dict[Path, Dict[str, Any]]:
+        """
+        Request the metadata of a batch of images from the running ExifTool process.
+
+        Args:
+            image_paths (List[Path]): Paths to the image files.
+
+        Returns:
+            Dict[Path, Dict[str, Any]]: The metadata of each image, keyed by its path. Images
+            ExifTool could not read are missing from the result.
+
+        Raises:
+            OSError: If ExifTool could not be started (e.g. it is not installed).
+            RuntimeError: If the ExifTool process exited unexpectedly.
+        """
+        if self._process is None:
+            self._start()
+        request_number = next(self._request_numbers)
+        # Send one file name per line followed by a numbered '-execute' to run the request
+        self._process.stdin.write("".join(f"{image_path}\n" for image_path in image_paths) + f"-execute{request_number}\n")
+        self._process.stdin.flush()
+        # Collect the output until ExifTool signals that this request is complete
+        ready_line = f"{{ready{request_number}}}"
+        lines = []
+        while True:
+            line = self._process.stdout.readline()
+            if not line:
+                raise RuntimeError("ExifTool exited unexpectedly.")
+            if line.startswith("{ready"):
+                if line.rstrip() == ready_line:
+                    break
+                # The end of an earlier request that was abandoned part way; discard its output
+                lines = []
+                continue
+            lines.append(line)
+        output = "".join(lines)
+        # ExifTool prints nothing to stdout if it could not read any of the files
+        if not output.strip():
             return {}
-        # Load the JSON output into a Python list of dictionaries
-        metadata_list = json.loads(result.stdout)
-        # ExifTool outputs a list; return the first item (should be the only one)
-        return metadata_list[0] if metadata_list else {}
-    except Exception as e:
-        # Catch any exceptions that occurred during the process
-        print(f"Error extracting metadata for {image_path}: {e}")
-        # Return an empty dictionary to signify failure
-        return {}
+        # ExifTool outputs a JSON list with one entry per file it could read
+        metadata_list = json_loads(output)
+        for metadata in metadata_list:
+            for tag, value in metadata.items():
+                # With '-b', values that are not valid UTF-8 are returned base64-encoded
+                if isinstance(value, str) and value.startswith("base64:"):
+                    metadata[tag] = base64.b64decode(value[len("base64:"):]).decode("utf-8", errors="replace")
+        # Match entries to files by 'SourceFile', since unreadable files are left out of the list
+        return {Path(metadata["SourceFile"]): metadata for metadata in metadata_list}
+
+def read_png_text(image_path: Path) -> Optional[Dict[str, Any]]:
+    """
+    Read the metadata of a PNG image directly from its text chunks, without ExifTool.
+
+    ComfyUI and Automatic1111 store their metadata in standard tEXt, zTXt or iTXt chunks, which
+    come before the image data. The chunks are read in order until the first image data (IDAT)
+    chunk, or until all of METADATA_TAGS were found, so the pixel data is never read. Other chunks,
+    and text chunks with other keywords (such as ComfyUI's large 'prompt'), are skipped with a seek
+    instead of being read. Keywords are matched case-insensitively and named the way ExifTool
+    names them (e.g. 'workflow' becomes 'Workflow').
+
+    Args:
+        image_path (Path): Path to the PNG image file.
+
+    Returns:
+        Optional[Dict[str, Any]]: A dictionary containing the image metadata, or None if the file
+        is not a PNG or could not be parsed (ExifTool is used for it instead).
+    """
+    # Map lowercased keywords to the tag names they are reported under
+    wanted_tags = {tag.lower(): tag for tag in METADATA_TAGS}
+    metadata = {}
+    try:
+        # A small buffer: only the chunk headers and the wanted text are read
+        with open(image_path, "rb", buffering=8192) as file:
+            if file.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+                return None
+            while len(metadata) < len(wanted_tags):
+                # Each chunk is a 4-byte length, a 4-byte type, the data and a 4-byte CRC
+                header = file.read(8)
+                if len(header) < 8:
+                    # The file ended before the image data; it is damaged
+                    return None
+                length = int.from_bytes(header[:4], "big")
+                chunk_type = header[4:]
+                if chunk_type in (b"IDAT", b"IEND"):
+                    # Text chunks that matter come before the image data
+                    break
+                if chunk_type not in (b"tEXt", b"zTXt", b"iTXt"):
+                    # Skip the data and CRC of chunks that carry no text
+                    file.seek(length + 4, os.SEEK_CUR)
+                    continue
+                # Keywords are at most 79 bytes followed by a NUL, so this is enough to identify the chunk
+                data = file.read(min(length, 80))
+                keyword, separator, _ = data.partition(b"\0")
+                tag = wanted_tags.get(keyword.decode("latin-1").lower()) if separator else None
+                if tag is None or tag in metadata:
+                    # Not a tag we use, or a repeated one (the first occurrence wins, as in ExifTool);
+                    # skip the rest of the data and the CRC
+                    file.seek(length - len(data) + 4, os.SEEK_CUR)
+                    continue
+                # Read the rest of the text
+                data += file.read(length - len(data))
+                file.read(4)             # Skip the CRC
+                if len(data) < length:
+                    return None
+                _, _, rest = data.partition(b"\0")
+                if chunk_type == b"tEXt":
+                    # Keyword, NUL, Latin-1 text
+                    metadata[tag] = rest.decode("latin-1")
+                elif chunk_type == b"zTXt":
+                    # Keyword, NUL, compression method, zlib-compressed Latin-1 text
+                    metadata[tag] = zlib.decompress(rest[1:]).decode("latin-1")
+                else:
+                    # Keyword, NUL, compression flag, compression method, language tag, NUL,
+                    # translated keyword, NUL, UTF-8 text (zlib-compressed if the flag is set)
+                    compressed = rest[:1] == b"\1"
+                    _, _, rest = rest[2:].partition(b"\0")
+                    _, _, text = rest.partition(b"\0")
+                    metadata[tag] = (zlib.decompress(text) if compressed else text).decode("utf-8", errors="replace")
+    except (OSError, zlib.error):
+        # Unreadable files and corrupt compressed text are left to ExifTool
+        return None
+    return metadata
+
+def prefetch_headers(image_paths: List[Path]) -> None:
+    """
+    Ask the OS to start reading the beginning of each file into the page cache.
+
+    The reads for the whole batch are issued at once and complete in the background, so the
+    headers are already in memory when they are parsed instead of waiting on the disk file by
+    file. Does nothing on systems without posix_fadvise (e.g. Windows).
+
+    Args:
+        image_paths (List[Path]): Paths to the image files.
+
+    Returns:
+        None
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for image_path in image_paths:
+        try:
+            fd = os.open(image_path, os.O_RDONLY)
+        except OSError:
+            # Files that cannot be opened are reported when their metadata is read
+            continue
+        try:
+            # Start an asynchronous read of the header without waiting for it
+            os.posix_fadvise(fd, 0, PREFETCH_BYTES, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
+class MetadataCache:
+    """
+    On-disk cache of the metadata extracted from image files, stored in a SQLite database.
+
+    Entries are keyed by a file's device, inode, modification time and size, so a file that was
+    modified or replaced is read again while unchanged files are answered from the cache.
+
+    Entries are only needed while a file stays where it is: the entries of files moved to the
+    review folder are deleted at the end of the run, so the cache holds just the files that are
+    still waiting to be converted.
+
+    The cache is best-effort: if the database cannot be opened or used (e.g. an unwritable home
+    folder, a damaged file, or another run holding a lock), a warning is printed once and the run
+    continues without it.
+
+    Use it as a context manager so changes are committed and the database is closed:
+
+        with MetadataCache(METADATA_CACHE_PATH) as cache:
+            key = MetadataCache.key(image_path)
+            metadata = cache.get(key)
+    """
+
+    def __init__(self, cache_path: Path) -> None:
+        self._cache_path = cache_path      # Location of the SQLite database file
+        self._connection = None            # The open database connection (None while the cache is unusable)
+
+    def __enter__(self) -> "MetadataCache":
+        try:
+            # Open (or create) the database and make sure the table exists
+            self._connection = sqlite3.connect(str(self._cache_path))
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                "device INTEGER, inode INTEGER, mtime_ns INTEGER, size INTEGER, metadata BLOB, "
+                "PRIMARY KEY (device, inode, mtime_ns, size))"
+            )
+        except (OSError, sqlite3.Error) as e:
+            self._disable(e)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        # Save any new entries and close the database
+        self.commit()
+        if self._connection is not None:
+            self._connection.close()
+
+    def _disable(self, error: Exception) -> None:
+        """
+        Stop using the cache after an error, warning about it once.
+
+        Args:
+            error (Exception): The error that made the cache unusable.
+
+        Returns:
+            None
+        """
+        print(f"Warning: metadata cache {self._cache_path} is unavailable, continuing without it: {error}")
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except sqlite3.Error:
+                # The connection is being dropped anyway
+                pass
+        self._connection = None
+
+    @staticmethod
+    def key(image_path: Path) -> Tuple[int, int, int, int]:
+        """
+        Build the cache key identifying the current version of a file.
+
+        Args:
+            image_path (Path): Path to the image file.
+
+        Returns:
+            Tuple[int, int, int, int]: The file's device, inode, modification time and size.
+
+        Raises:
+            OSError: If the file cannot be accessed.
+        """
+        stat = os.stat(image_path)
+        return stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def get(self, key: Tuple[int, int, int, int]) -> Optional[Dict[str, Any]]:
+        """
+        Look up the cached metadata of a file.
+
+        Args:
+            key (Tuple[int, int, int, int]): The file's cache key (see key()).
+
+        Returns:
+            Optional[Dict[str, Any]]: The cached metadata, or None if the file is not cached
+            (or has changed since it was cached, or the cache is unavailable).
+        """
+        if self._connection is None:
+            return None
+        try:
+            row = self._connection.execute(
+                "SELECT metadata FROM metadata WHERE device = ? AND inode = ? AND mtime_ns = ? AND size = ?",
+                key,
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._disable(e)
+            return None
+        return json_loads(row[0]) if row else None
+
+    def put(self, key: Tuple[int, int, int, int], metadata: Dict[str, Any]) -> None:
+        """
+        Store the metadata of a file in the cache.
+
+        Args:
+            key (Tuple[int, int, int, int]): The file's cache key (see key()), taken before the
+                metadata was read.
+            metadata (Dict[str, Any]): The metadata extracted from the file.
+
+        Returns:
+            None
+        """
+        if self._connection is None:
+            return
+        try:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?)",
+                key + (json_dumps(metadata, indent=False),),
+            )
+        except sqlite3.Error as e:
+            self._disable(e)
+
+    def delete(self, keys: List[Tuple[int, int, int, int]]) -> None:
+        """
+        Remove the entries of files that no longer need them (e.g. moved to the review folder).
+
+        Args:
+            keys (List[Tuple[int, int, int, int]]): The cache keys of the files (see key()).
+
+        Returns:
+            None
+        """
+        if self._connection is None:
+            return
+        try:
+            self._connection.executemany(
+                "DELETE FROM metadata WHERE device = ? AND inode = ? AND mtime_ns = ? AND size = ?",
+                keys,
+            )
+        except sqlite3.Error as e:
+            self._disable(e)
+
+    def commit(self) -> None:
+        """
+        Save the entries added so far, so they survive an interrupted run.
+
+        Returns:
+            None
+        """
+        if self._connection is None:
+            return
+        try:
+            self._connection.commit()
+        except sqlite3.Error as e:
+            self._disable(e)
+
+def cache_keys(image_paths: List[Path]) -> Dict[Path, Tuple[int, int, int, int]]:
+    """
+    Build the cache keys of a batch of images.
+
+    The keys are taken once, before the files are read, so the same stat serves looking the
+    files up, caching them and deleting their entries once they have been moved.
+
+    Args:
+        image_paths (List[Path]): Paths to the image files.
+
+    Returns:
+        Dict[Path, Tuple[int, int, int, int]]: The cache key of each file that could be accessed,
+        keyed by its path.
+    """
+    keys = {}
+    for image_path in image_paths:
+        try:
+            keys[image_path] = MetadataCache.key(image_path)
+        except OSError:
+            # Leave the file out; reading it reports the error
+            continue
+    return keys
+
+def extract_metadata_cached(image_paths: List[Path], keys: Dict[Path, Tuple[int, int, int, int]], session: ExifToolSession, cache: MetadataCache) -> Dict[Path, Dict[str, Any]]:
+    """
+    Extract metadata from a batch of images, using the cache for files that were read before.
+
+    Only the files missing from the cache are read: their text chunks are parsed directly, and
+    just the files that cannot be parsed that way are sent to ExifTool. The metadata read is then
+    added to the cache, which is committed once per batch. If ExifTool fails (e.g. it is not
+    installed), the error is reported and the files that needed it are left out of the result,
+    so they are not converted without their metadata.
+
+    Args:
+        image_paths (List[Path]): Paths to the image files.
+        keys (Dict[Path, Tuple[int, int, int, int]]): The cache keys of the files, taken before
+            reading them (see cache_keys()); files without a key are read but not cached.
+        session (ExifToolSession): The ExifTool session to query for files that cannot be parsed.
+        cache (MetadataCache): The open metadata cache.
+
+    Returns:
+        Dict[Path, Dict[str, Any]]: The metadata of each image whose metadata could be read,
+        keyed by its path (an empty dictionary for files ExifTool could not read).
+    """
+    metadata_by_path = {}
+    missing_paths = []
+    for image_path in image_paths:
+        if image_path not in keys:
+            # The file cannot be accessed; it is not cached, and reading it reports the error
+            missing_paths.append(image_path)
+            continue
+        metadata = cache.get(keys[image_path])
+        if metadata is None:
+            missing_paths.append(image_path)
+        else:
+            metadata_by_path[image_path] = metadata
+    if missing_paths:
+        # Read the files missing from the cache and remember the results
+        prefetch_headers(missing_paths)
+        extracted = {}
+        fallback_paths = []
+        for image_path in missing_paths:
+            metadata = read_png_text(image_path)
+            if metadata is None:
+                fallback_paths.append(image_path)
+            else:
+                extracted[image_path] = metadata
+        if fallback_paths:
+            try:
+                # Let ExifTool try the files that could not be parsed directly
+                exiftool_metadata = extract_metadata(fallback_paths, session)
+            except Exception as e:
+                # Without ExifTool these files' metadata is unknown; leave them out
+                print(f"Error extracting metadata for {len(fallback_paths)} files starting at {fallback_paths[0]}, skipping them: {e}")
+            else:
+                extracted.update(exiftool_metadata)
+                for image_path in fallback_paths:
+                    # ExifTool leaves out files it could not read; they have no metadata to save
+                    metadata_by_path.setdefault(image_path, {})
+        for image_path, metadata in extracted.items():
+            if image_path in keys:
+                cache.put(keys[image_path], metadata)
+        cache.commit()
+        metadata_by_path.update(extracted)
+    return metadata_by_path
+
+def extract_metadata(image_paths: List[Path], session: ExifToolSession) -> Dict[Path, Dict[str, Any]]:
+    """
+    Extract metadata from a batch of images using ExifTool.
+
+    Only used for files read_png_text() could not parse. ExifTool returns a JSON object per file
+    ('-j -b') with 'SourceFile' and whichever of METADATA_TAGS the file contains, e.g.
+    {"SourceFile": "C:/Photos/ComfyUI_00003_.png", "Workflow": "{\"last_node_id\": 51, ...}"}.
+
+    Args:
+        image_paths (List[Path]): Paths to the image files.
+        session (ExifToolSession): The ExifTool session to query.
+
+    Returns:
+        Dict[Path, Dict[str, Any]]: The metadata of each image, keyed by its path. Images
+        ExifTool could not read are missing from the result.
+
+    Raises:
+        OSError: If ExifTool could not be started (e.g. it is not installed).
+        RuntimeError: If the ExifTool process exited unexpectedly.
+    """
+    # Ask the shared ExifTool process for the metadata of the whole batch
+    return session.get_tags(image_paths)
 
 def save_metadata(file_path: Path, metadata, extension: str) -> None:
     """
     Save metadata to a file with the same base name as the image.
 
+    The content is written to a temporary file in the same folder first, and only the finished
+    file is given its final name (see link_unique), so an interrupted run never leaves an empty or
+    half-written metadata file under that name. At worst a hidden '.<name>.*.tmp' file is left
+    behind if the process is killed while writing.
+
     Args:
         file_path (Path): The original image file path.
-        metadata: The metadata to save (can be a dictionary or a string).
+        metadata: The metadata to save (can be a dictionary or a string). Strings are written
+            verbatim, so a string that already holds JSON is not parsed and re-serialized.
         extension (str): The file extension to use (e.g., '.json' or '.txt').
 
     Returns:
         None
     """
+    if extension == ".json" and not isinstance(metadata, str):
+        try:
+            # Serialize the metadata as formatted JSON
+            content = json_dumps(metadata)
+        except TypeError as e:
+            # If the metadata is not JSON-serializable, print an error
+            print(f"Error saving JSON metadata for {file_path}: {e}")
+            return
+    else:
+        # Use the metadata as raw text (this includes JSON that is already serialized)
+        content = (metadata if isinstance(metadata, str) else str(metadata)).encode("utf-8")
+
     # Construct the new file path with the desired extension
     save_path = file_path.with_suffix(extension)
-    # Generate a unique filename if the file already exists
-    save_path = ensure_unique_filename(save_path)
-    # Open the file in write mode with UTF-8 encoding
-    with open(save_path, "w", encoding="utf-8") as file:
-        if extension == ".json":
-            try:
-                # Attempt to write the metadata as formatted JSON
-                json.dump(metadata, file, ensure_ascii=False, indent=4)
-                print(f"Saved metadata to {save_path}")
-            except TypeError as e:
-                # If the metadata is not JSON-serializable, print an error
-                print(f"Error saving JSON metadata for {file_path}: {e}")
-        else:
-            # Write metadata as raw text
-            file.write(metadata if isinstance(metadata, str) else str(metadata))
-            print(f"Saved metadata to {save_path}")
+    # Write the content to a new temporary file next to it (never an existing file), with a large
+    # buffer so big workflows are written in few system calls
+    fd, temp_name = tempfile.mkstemp(dir=save_path.parent, prefix=f".{save_path.name}.", suffix=".tmp")
+    temp_path = Path(temp_name)
+    try:
+        with os.fdopen(fd, "wb", buffering=256 * 1024) as file:
+            file.write(content)
+        # mkstemp creates the file readable by its owner only; use the usual permissions
+        os.chmod(temp_path, 0o644)
+        # Give the finished file a unique name, in case the file already exists
+        save_path = link_unique(temp_path, save_path)
+    finally:
+        # Remove the temporary name (the content stays under the final name)
+        try:
+            temp_path.unlink()
+        except FileNotFoundError:
+            # Already renamed into place
+            pass
+    print(f"Saved metadata to {save_path}")
 
-def ensure_unique_filename(file_path: Path) -> Path:
+def link_unique(source_path: Path, file_path: Path) -> Path:
     """
-    Generate a unique file path by appending a counter if the file already exists.
+    Give a finished file a new name, appending a counter to the name if the file already exists.
+
+    Each name is claimed with a hard link, which fails atomically if the name is taken, so no
+    separate existence check is needed and two workers can never claim the same name. The source
+    file keeps its own name as well and should be removed afterwards.
+
+    On filesystems without hard links (e.g. FAT32/exFAT drives), the name is reserved with an
+    empty file instead (see open_unique) and the source file is renamed over it; an interrupted
+    run can then leave that empty file behind.
 
     Args:
+        source_path (Path): The finished file, in the same folder as file_path.
         file_path (Path): The desired file path.
 
     Returns:
-        Path: A unique file path that does not exist yet.
+        Path: The unique file path the file now has.
     """
-    counter = 1
-    unique_path = file_path
-    # Loop until a unique file name is found
-    while unique_path.exists():
-        # Append a counter to the file stem (base name without suffix)
-        new_stem = f"{file_path.stem}_{counter}"
-        # Create a new file path with the modified stem
-        unique_path = file_path.with_name(f"{new_stem}{file_path.suffix}")
-        # Increment the counter for the next iteration if needed
-        counter += 1
-    # Return the unique file path
-    return unique_path
+    for counter in itertools.count():
+        # Try the desired name first, then append a counter to the file stem (base name without suffix)
+        unique_path = file_path if counter == 0 else file_path.with_name(f"{file_path.stem}_{counter}{file_path.suffix}")
+        try:
+            os.link(source_path, unique_path)
+        except FileExistsError:
+            # The name is taken; try the next counter
+            continue
+        except OSError:
+            # Hard links are not supported here; reserve the name and rename the file over it
+            unique_path, placeholder = open_unique(unique_path)
+            placeholder.close()
+            os.replace(source_path, unique_path)
+        return unique_path
+
+def open_unique(file_path: Path) -> Tuple[Path, BinaryIO]:
+    """
+    Create and open a new file, appending a counter to its name if the file already exists.
+
+    The file is created atomically (O_CREAT | O_EXCL), so no separate existence check is needed
+    and two workers can never claim the same name.
+
+    Args:
+        file_path (Path): The desired file path.
+
+    Returns:
+        Tuple[Path, BinaryIO]: The unique file path that was created, and the file opened for
+        writing in binary mode.
+    """
+    for counter in itertools.count():
+        # Try the desired name first, then append a counter to the file stem (base name without suffix)
+        unique_path = file_path if counter == 0 else file_path.with_name(f"{file_path.stem}_{counter}{file_path.suffix}")
+        try:
+            # Create the file, failing if it already exists (O_BINARY stops Windows translating newlines twice)
+            fd = os.open(unique_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o644)
+        except FileExistsError:
+            # The name is taken; try the next counter
+            continue
+        # Return the unique file path and the file opened on its descriptor
+        return unique_path, os.fdopen(fd, "wb")
+
+@lru_cache(maxsize=None)
+def _ensure_dir(directory: Path) -> None:
+    """
+    Create a directory and its parents, once per directory.
+
+    Results are cached, so later files in the same directory skip the mkdir calls entirely.
+
+    Args:
+        directory (Path): The directory to create.
+
+    Returns:
+        None
+    """
+    directory.mkdir(parents=True, exist_ok=True)
 
 def move_file_with_structure(file_path: Path, root_folder: Path, destination_folder: Path) -> None:
     """
     Move a file to the destination folder, preserving its relative directory structure.
 
+    The destination directory is normally created up front (see _ensure_dir), so the move is a
+    single rename; it is only created here if it has gone missing since.
+
     Args:
         file_path (Path): The original file path.
         root_folder (Path): The root folder containing all files.
@@ -201,41 +987,48 @@ def move_file_with_structure(file_path: Path, root_folder: Path, destination_fol
     relative_path = file_path.relative_to(root_folder)
     # Construct the destination path by joining the destination folder and relative path
     destination_path = destination_folder / relative_path
-    # Ensure that all parent directories of the destination path exist
-    destination_path.parent.mkdir(parents=True, exist_ok=True)
-    # Move the file to the destination path
-    shutil.move(str(file_path), str(destination_path))
+    try:
+        try:
+            # Move the file with a single rename, which works when both folders are on the same filesystem
+            os.replace(file_path, destination_path)
+        except FileNotFoundError:
+            # The destination directory was removed after it was created (e.g. by the user while
+            # the script runs); create it again and retry, or re-raise if the source is missing
+            if destination_path.parent.is_dir():
+                raise
+            destination_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(file_path, destination_path)
+    except OSError as e:
+        # A rename cannot cross filesystems; let shutil copy the file and delete the original instead
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(str(file_path), str(destination_path))
 
-def process_png_file(image_path: Path, root_folder: Path, review_folder: Path) -> None:
+def save_image_metadata(image_path: Path, metadata: Dict[str, Any], pretty: bool = False) -> None:
     """
-    Process a single PNG file:
-        - Extract metadata ('Workflow' or 'Parameters') and save appropriately.
-        - Convert the PNG image to AVIF format.
-        - Move the original PNG file to the review folder.
+    Save the 'Workflow' (ComfyUI) or 'Parameters' (Automatic1111) metadata of an image.
 
     Args:
         image_path (Path): Path to the PNG image file.
-        root_folder (Path): Root directory containing all images.
-        review_folder (Path): Directory to store the original PNG files for review.
+        metadata (Dict[str, Any]): The image metadata.
+        pretty (bool): Whether to re-indent the 'Workflow' JSON; by default it is saved exactly as
+            embedded, which avoids a parse and re-serialize round-trip.
 
     Returns:
         None
     """
-    # Extract metadata from the image
-    metadata = extract_metadata(image_path)
-
     # Check for 'Workflow' metadata (ComfyUI)
     if "Workflow" in metadata:
         data = metadata["Workflow"]         # Get the 'Workflow' data
         try:
-            # Try to parse the 'Workflow' data as JSON
-            json_data = json.loads(data)
-            # Save the parsed JSON data to a .json file
-            save_metadata(image_path, json_data, ".json")
+            # Check that the 'Workflow' data is valid JSON
+            json_data = json_loads(data)
         except json.JSONDecodeError as e:
-            # If parsing fails, save the raw data to a .json file
+            # If parsing fails, report it and save the raw data
             print(f"Error parsing 'Workflow' metadata in {image_path}: {e}")
-            save_metadata(image_path, data, ".json")
+            json_data = data
+        # Save the re-indented JSON if requested, and otherwise the 'Workflow' string as-is
+        save_metadata(image_path, json_data if pretty else data, ".json")
     # If 'Workflow' is not present, check for 'Parameters' metadata (Automatic1111)
     elif "Parameters" in metadata:
         params = metadata["Parameters"]     # Get the 'Parameters' data
@@ -245,59 +1038,405 @@ def process_png_file(image_path: Path, root_folder: Path, review_folder: Path) -
         # If neither 'Workflow' nor 'Parameters' metadata is found, proceed without saving metadata
         print(f"No 'Workflow' or 'Parameters' metadata found for: {image_path}")
 
-    # Convert the PNG image to AVIF format
+def process_png_file(image_path: Path, metadata: Dict[str, Any], root_folder: Path, review_folder: Path, pretty: bool = False) -> bool:
+    """
+    Process a single PNG file:
+        - Save its metadata ('Workflow' or 'Parameters') appropriately.
+        - Convert the PNG image to AVIF format (at the same time as saving the metadata).
+        - Move the original PNG file to the review folder.
+
+    If an earlier run already converted the file but stopped before moving it (an AVIF file at
+    least as new as the PNG is next to it; see is_converted()), that run's work is finished
+    instead: the metadata is saved only if no sidecar file exists yet, and the PNG is moved
+    without being encoded again.
+
+    Args:
+        image_path (Path): Path to the PNG image file.
+        metadata (Dict[str, Any]): The image metadata as read by the metadata stage.
+        root_folder (Path): Root directory containing all images.
+        review_folder (Path): Directory to store the original PNG files for review.
+        pretty (bool): Whether to re-indent the 'Workflow' JSON when saving it.
+
+    Returns:
+        bool: True if the file was converted and moved to the review folder, False otherwise.
+    """
     avif_path = image_path.with_suffix(".avif")   # Define the output file path
-    if compress_to_avif(image_path, avif_path):
+    if is_converted(image_path, avif_path):
+        # An earlier run converted the file but stopped before moving it; finish its work instead
+        print(f"Found an up-to-date {avif_path}, finishing the earlier conversion of {image_path}")
+        # Save the metadata unless the earlier run already did, so no duplicate sidecar is written
+        if not (image_path.with_suffix(".json").exists() or image_path.with_suffix(".txt").exists()):
+            save_image_metadata(image_path, metadata, pretty)
+        move_file_with_structure(image_path, root_folder, review_folder)
+        return True
+    with ThreadPoolExecutor(max_workers=1) as metadata_writer:
+        # Save the metadata in a background thread while the image is being encoded
+        save_future = metadata_writer.submit(save_image_metadata, image_path, metadata, pretty)
+        # Convert the PNG image to AVIF format
+        converted = compress_to_avif(image_path, avif_path)
+        # Wait for the metadata to be saved (re-raising any error) before moving the original
+        save_future.result()
+    if converted:
         # If conversion succeeds, move the original PNG file to the review folder
         move_file_with_structure(image_path, root_folder, review_folder)
+    return converted
+
+def is_converted(png_path: Path, avif_path: Path) -> bool:
+    """
+    Check whether a PNG file was already converted to the given AVIF file.
+
+    AVIF files are only put in place once their encode has finished (see compress_to_avif()), so
+    an existing one is complete; it is up to date if it was written no earlier than the PNG.
+
+    Args:
+        png_path (Path): Path to the PNG image file.
+        avif_path (Path): Path to its AVIF file.
+
+    Returns:
+        bool: True if the AVIF file exists and is at least as new as the PNG, False otherwise or
+        if either cannot be read.
+    """
+    try:
+        return os.stat(avif_path).st_mtime_ns >= os.stat(png_path).st_mtime_ns
+    except OSError:
+        # Treat a missing or unreadable AVIF as not converted, so the PNG is encoded (and any error reported)
+        return False
+
+def _init_worker(root_folder: Path, review_folder: Path, pretty: bool, tool_paths: Dict[str, str]) -> None:
+    """
+    Initialize a worker process of the process pool.
+
+    Stores the settings shared by every task, so they do not have to be sent with each file, and
+    applies the per-encode thread limit to the in-process ImageMagick, if used.
+
+    Args:
+        root_folder (Path): Root directory containing all images.
+        review_folder (Path): Directory to store the original PNG files for review.
+        pretty (bool): Whether to re-indent the 'Workflow' JSON when saving it.
+        tool_paths (Dict[str, str]): The external tool paths resolved by check_dependencies().
+
+    Returns:
+        None
+    """
+    global _root_folder, _review_folder, _pretty_json
+    _root_folder = root_folder
+    _review_folder = review_folder
+    _pretty_json = pretty
+    # Workers started with 'spawn' do not inherit the paths resolved in the main process
+    TOOL_PATHS.update(tool_paths)
+    if get_avif_encoder() == "wand":
+        # Limit the threads used by each in-process ImageMagick encode
+        wand_limits["thread"] = ENCODE_THREADS
+
+def _process_png_worker(task: Tuple[Path, Dict[str, Any]]) -> bool:
+    """
+    Process a single PNG file inside a worker process, reporting any errors.
+
+    Args:
+        task (Tuple[Path, Dict[str, Any]]): Path to the PNG image file and its metadata.
+
+    Returns:
+        bool: True if the file was converted and moved to the review folder, False otherwise.
+    """
+    image_path, metadata = task
+    try:
+        return process_png_file(image_path, metadata, _root_folder, _review_folder, _pretty_json)
+    except Exception as e:
+        # Report the error here so one bad file does not stop the whole batch
+        print(f"Error processing file {image_path}: {e}")
+        return False
+
+def iter_png_files(folder_path: Path, skip_folder: Path) -> Iterator[Path]:
+    """
+    Recursively find all PNG files in a folder and its subfolders.
+
+    Uses os.scandir, whose entries already know whether they are files or directories, so no
+    extra stat call is needed per entry (unlike Path.rglob). PNG files that were already
+    converted by an earlier, interrupted run are still found; process_png_file() finishes them
+    without encoding them again.
+
+    Args:
+        folder_path (Path): Path to the folder to search.
+        skip_folder (Path): A folder whose contents are not searched.
+
+    Returns:
+        Iterator[Path]: Paths of the PNG files found.
+    """
+    # Directories still to be searched
+    pending_dirs = [str(folder_path)]
+    # Compare the skipped folder as a string, so no Path object is built per directory entry
+    # (normcase keeps the comparison case-insensitive on Windows, like Path equality)
+    skip_dir = os.path.normcase(str(skip_folder))
+    while pending_dirs:
+        directory = pending_dirs.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        # Search subdirectories later, except the skipped folder
+                        if os.path.normcase(entry.path) != skip_dir:
+                            pending_dirs.append(entry.path)
+                    elif entry.name.lower().endswith(".png") and entry.is_file():
+                        yield Path(entry.path)
+        except OSError as e:
+            # Skip directories that cannot be read (e.g. missing permissions)
+            print(f"Error reading directory {directory}: {e}")
 
-def process_images_concurrently(folder_path: Path, review_folder: Path) -> None:
+def discover_png_files(folder_path: Path, review_folder: Path, file_queue: queue.Queue) -> None:
     """
-    Process all PNG files in a folder and its subfolders concurrently.
+    Recursively find all PNG files in a folder and put them on a queue as they are found.
+
+    Runs in a background thread so processing can start before the whole tree has been walked.
+    A final None is put on the queue once the walk is complete, or the exception that stopped it
+    if it failed, so the failure is raised in the main thread instead of ending the run quietly.
+
+    Args:
+        folder_path (Path): Path to the folder containing PNG files.
+        review_folder (Path): Path to the review folder, which is skipped.
+        file_queue (queue.Queue): Queue receiving the discovered PNG file paths.
+
+    Returns:
+        None
+    """
+    end_of_walk = None
+    try:
+        # Skip the review folder, which receives the original PNG files while we are walking
+        for png_path in iter_png_files(folder_path, review_folder):
+            # Blocks while the queue is full, so discovery never runs far ahead of processing
+            file_queue.put(png_path)
+    except Exception as e:
+        # Pass the error on instead of the normal end marker
+        end_of_walk = e
+    finally:
+        # Signal the end of the walk, even if it failed part way through
+        file_queue.put(end_of_walk)
+
+def iter_batches(file_queue: queue.Queue, batch_size: int) -> Iterator[List[Path]]:
+    """
+    Group the files coming off the discovery queue into batches.
+
+    Waits for at least one file, then adds whatever else is already queued (up to batch_size),
+    so batches are large while discovery is ahead and files are never held back waiting.
+
+    Args:
+        file_queue (queue.Queue): Queue of discovered PNG file paths, ending with None (or the
+            exception that stopped the discovery).
+        batch_size (int): Maximum number of files in a batch.
+
+    Returns:
+        Iterator[List[Path]]: Batches of PNG file paths.
+
+    Raises:
+        Exception: The error that stopped the discovery, if it failed.
+    """
+    batch = []
+    while True:
+        png_path = file_queue.get()
+        if png_path is None:
+            break
+        if isinstance(png_path, Exception):
+            raise png_path
+        batch.append(png_path)
+        # Hand over the batch once it is full or nothing else is waiting
+        if len(batch) >= batch_size or file_queue.empty():
+            yield batch
+            batch = []
+    # Hand over whatever was collected before the end of the walk
+    if batch:
+        yield batch
+
+def read_metadata_stage(file_queue: queue.Queue, task_queue: queue.Queue) -> None:
+    """
+    Read the metadata of discovered PNG files in batches and queue them for the workers.
+
+    Runs in a background thread, so the next files are read while the workers are encoding.
+    Files whose metadata cannot be read are reported and queued with None instead, so they are
+    left in place for the next run (and counted as not converted). A final None is put on the
+    task queue once all files have been queued, or the exception that stopped this stage (or the
+    discovery) if it failed, so the main thread raises it instead of ending the run as if all
+    files had been processed.
+
+    Args:
+        file_queue (queue.Queue): Queue of discovered PNG file paths, ending with None (or the
+            exception that stopped the discovery).
+        task_queue (queue.Queue): Queue receiving (path, metadata, cache key) tuples for the
+            workers, with None as the metadata of files to skip (and as the key of files that
+            could not be accessed).
+
+    Returns:
+        None
+    """
+    end_of_files = None
+    try:
+        # The ExifTool session (started only if needed) and cache are opened in this thread, which is
+        # the only one using them
+        with ExifToolSession() as session, MetadataCache(METADATA_CACHE_PATH) as cache:
+            for batch in iter_batches(file_queue, EXIFTOOL_BATCH_SIZE):
+                keys = cache_keys(batch)
+                try:
+                    metadata_by_path = extract_metadata_cached(batch, keys, session, cache)
+                except Exception as e:
+                    # Skip this batch rather than converting its files without their metadata;
+                    # they stay where they are and are read again on the next run
+                    print(f"Error reading metadata for {len(batch)} files starting at {batch[0]}, skipping them: {e}")
+                    metadata_by_path = {}
+                for png_path in batch:
+                    # Blocks while the queue is full, so metadata reading stays just ahead of the workers
+                    # (files missing from the result are skipped)
+                    task_queue.put((png_path, metadata_by_path.get(png_path), keys.get(png_path)))
+    except Exception as e:
+        # Pass the error on to the main thread instead of the normal end marker
+        end_of_files = e
+    finally:
+        # Signal the end of the files, even if reading failed part way through
+        task_queue.put(end_of_files)
+
+def collect_finished(pending: Dict[Future, Tuple[Path, Optional[Tuple[int, int, int, int]]]], timeout: Optional[float], progress_bar: tqdm) -> List[Optional[Tuple[int, int, int, int]]]:
+    """
+    Wait for at least one submitted file to finish, and report every file that has finished.
+
+    Errors are reported per file; this includes a worker process that was killed (e.g. by the
+    OS running out of memory), which breaks the pool and fails all of its pending files.
+
+    Args:
+        pending (Dict[Future, Tuple[Path, Optional[Tuple[int, int, int, int]]]]): The files
+            submitted to the workers that have not finished yet, with their cache keys, keyed by
+            their futures; finished files are removed.
+        timeout (Optional[float]): Maximum number of seconds to wait, or None to wait until a
+            file finishes.
+        progress_bar (tqdm): The progress bar to advance for each finished file.
+
+    Returns:
+        List[Optional[Tuple[int, int, int, int]]]: The cache keys of the finished files that were
+        moved to the review folder (None for files without a key).
+    """
+    moved_keys = []
+    done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+    for future in done:
+        png_path, key = pending.pop(future)
+        try:
+            moved = future.result()
+        except Exception as e:
+            # The worker reports its own errors, so this is the worker process itself failing
+            print(f"Error processing file {png_path}: {e}")
+            continue
+        if moved:
+            moved_keys.append(key)
+    # Update the progress bar for the finished files
+    progress_bar.update(len(done))
+    return moved_keys
+
+def process_images_concurrently(folder_path: Path, review_folder: Path, pretty: bool = False) -> None:
+    """
+    Process all PNG files in a folder and its subfolders in parallel worker processes.
+
+    Work flows through a pipeline: one background thread discovers the PNG files, a second reads
+    their metadata in batches from their text chunks (falling back to a single ExifTool process),
+    and this thread hands each file and its metadata to the worker processes, which save the
+    metadata, encode and move the files.
+    Files are processed as soon as they are discovered instead of after the whole tree has been
+    walked.
 
     Args:
         folder_path (Path): Path to the folder containing PNG files.
         review_folder (Path): Path to the folder where original PNG files will be moved.
+        pretty (bool): Whether to re-indent the 'Workflow' JSON when saving it.
 
     Returns:
         None
     """
-    # Recursively find all PNG files in the folder and its subfolders
-    png_files = list(folder_path.rglob("*.png"))
+    # Walk the folder in a background thread, feeding a bounded queue of PNG files
+    file_queue = queue.Queue(maxsize=DISCOVERY_QUEUE_SIZE)
+    threading.Thread(
+        target=discover_png_files,
+        args=(folder_path, review_folder, file_queue),
+        daemon=True,                          # Do not keep the program alive if processing is interrupted
+    ).start()
+    # Read metadata in a second background thread, feeding a small queue of files ready for the workers
+    task_queue = queue.Queue(maxsize=2 * WORKER_COUNT)
+    threading.Thread(
+        target=read_metadata_stage,
+        args=(file_queue, task_queue),
+        daemon=True,                          # Do not keep the program alive if processing is interrupted
+    ).start()
+    files_found = 0
+    # Cache keys of the files moved to the review folder, whose cache entries are no longer needed
+    # (None for files without a key)
+    moved_keys = []
+    # Files submitted to the workers that have not finished yet, by future; at most 2 per worker, so
+    # every worker has its next file ready without the rest piling up in the executor's own queue
+    pending = {}
+    max_pending = 2 * WORKER_COUNT
+    # Use tqdm without a total, since the number of files is not known up front
+    with tqdm(
+        desc="Processing PNG files",          # Description displayed in the progress bar
+        unit="file",                          # Count files rather than iterations
+        dynamic_ncols=True,                   # Adjust the progress bar width dynamically
+        mininterval=0.5,                      # Redraw at most twice per second, however fast files complete
+        smoothing=0.3                         # Smoothing factor for progress bar updates
+    ) as progress_bar, ProcessPoolExecutor(
+        max_workers=WORKER_COUNT,             # Number of files encoded in parallel
+        # Start fresh worker processes instead of forking: the background threads are already
+        # running, and a fork could copy a lock one of them holds (e.g. stdout's) into a worker,
+        # deadlocking it. Worker processes are started as needed, so starting the pool before the
+        # threads would not be enough. This is already the default on Windows and macOS.
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,             # Set up the folders and settings once per worker
+        initargs=(folder_path, review_folder, pretty, TOOL_PATHS),
+    ) as executor:
+        # Submit each file and its metadata to the workers as it comes off the queue
+        while True:
+            try:
+                task = task_queue.get_nowait()
+            except queue.Empty:
+                if pending:
+                    # No file is ready yet; show files finishing in the meantime, then check again
+                    moved_keys += collect_finished(pending, COMPLETION_POLL_INTERVAL, progress_bar)
+                    continue
+                task = task_queue.get()
+            if task is None:
+                break
+            if isinstance(task, Exception):
+                # A background stage failed; stop instead of reporting an incomplete run as finished
+                raise task
+            files_found += 1
+            png_path, metadata, key = task
+            if metadata is None:
+                # The metadata could not be read (already reported); leave the file where it is
+                progress_bar.update(1)
+                continue
+            try:
+                # Create the file's review directory up front, so the worker only has to rename the file
+                _ensure_dir(review_folder / png_path.parent.relative_to(folder_path))
+            except OSError as e:
+                # Skip this file (it stays where it is) rather than stopping the whole run
+                print(f"Error creating review folder for {png_path}, skipping it: {e}")
+                progress_bar.update(1)
+                continue
+            while len(pending) >= max_pending:
+                # Wait for a worker to finish a file before submitting another one
+                moved_keys += collect_finished(pending, None, progress_bar)
+            pending[executor.submit(_process_png_worker, (png_path, metadata))] = (png_path, key)
+        # Wait for the remaining files to finish, updating the progress bar as each one completes
+        while pending:
+            moved_keys += collect_finished(pending, None, progress_bar)
+    known_keys = [key for key in moved_keys if key is not None]
+    if known_keys:
+        # Drop the cache entries of the moved files, so the cache does not keep growing; the
+        # metadata stage has closed its connection by now, since it sent its end marker
+        with MetadataCache(METADATA_CACHE_PATH) as cache:
+            cache.delete(known_keys)
     # Check if any PNG files were found
-    if not png_files:
+    if not files_found:
         print("No PNG files found in the specified directory.")
-        return
-    # Use a ThreadPoolExecutor to process files concurrently
-    with ThreadPoolExecutor() as executor:
-        # Map each PNG file to a future task
-        future_to_file = {
-            executor.submit(process_png_file, file, folder_path, review_folder): file
-            for file in png_files
-        }
-        # Use tqdm to display a progress bar
-        with tqdm(
-            total=len(png_files),            # Total number of files to process
-            desc="Processing PNG files",     # Description displayed in the progress bar
-            dynamic_ncols=True,              # Adjust the progress bar width dynamically
-            smoothing=0.3                    # Smoothing factor for progress bar updates
-        ) as progress_bar:
-            # Iterate over the futures as they complete
-            for future in as_completed(future_to_file):
-                file = future_to_file[future]    # Get the corresponding file
-                try:
-                    # Retrieve the result to catch any exceptions
-                    future.result()
-                except Exception as e:
-                    # If an exception occurred, print an error message
-                    print(f"Error processing file {file}: {e}")
-                finally:
-                    # Update the progress bar
-                    progress_bar.update(1)
+    elif len(moved_keys) < files_found:
+        # Some files were skipped or failed to convert (each reported above)
+        print(f"{files_found - len(moved_keys)} of {files_found} PNG files were not converted (see the errors above); they were left in place and will be retried on the next run.")
 
 def main() -> None:
     """
     Main function to execute the script:
+        - Parses command-line options.
         - Checks for required dependencies.
         - Prompts the user for input and output directories.
         - Initiates concurrent processing of images.
@@ -305,9 +1444,24 @@ def main() -> None:
     Returns:
         None
     """
+    # Parse the command-line options
+    parser = argparse.ArgumentParser(description="Convert PNG images to AVIF, saving their embedded workflows and parameters.")
+    parser.add_argument("--clear-cache", action="store_true", help="delete the cached metadata of previously read files before processing")
+    parser.add_argument("--pretty", action="store_true", help="re-indent workflows when saving them instead of keeping them as embedded")
+    args = parser.parse_args()
+
+    if args.clear_cache:
+        try:
+            # Remove the metadata cache so every file is read again
+            METADATA_CACHE_PATH.unlink()
+            print(f"Cleared metadata cache: {METADATA_CACHE_PATH}")
+        except FileNotFoundError:
+            # Nothing has been cached yet
+            pass
+
     try:
-        # Check that required external tools are installed
-        check_dependencies()
+        # Check that required external tools are installed, and remember where they are
+        TOOL_PATHS.update(check_dependencies())
     except EnvironmentError as e:
         # If dependencies are missing, print the error message and exit
         print(e)
@@ -336,7 +1490,7 @@ def main() -> None:
     print(f"Review folder set to: {review_folder}")
 
     # Start processing images concurrently
-    process_images_concurrently(images_folder, review_folder)
+    process_images_concurrently(images_folder, review_folder, args.pretty)
     # Inform the user that processing is complete
     print("Processing complete.")
 
@@ -0,0 +1,75 @@
+import sys                       # For making the script importable from this folder
+import tempfile                  # For writing the test files to a temporary folder
+import unittest                  # For the test cases
+from pathlib import Path         # For object-oriented filesystem paths
+from unittest import mock        # For replacing the encoder with a fake one
+
+# The script lives in the repository root rather than in a package
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import ExtractComfyUIWorkflow  # noqa: E402
+from ExtractComfyUIWorkflow import compress_to_avif  # noqa: E402
+
+def fake_encoder(succeed: bool):
+    """
+    Build a stand-in for compress_to_avif_magick() that writes its output and then reports the
+    given result, like an encoder that fails after writing part of the file.
+
+    Args:
+        succeed (bool): The result the fake encoder reports.
+
+    Returns:
+        Callable[[Path, Path], bool]: The fake encoder.
+    """
+    def encode(png_path: Path, avif_path: Path) -> bool:
+        avif_path.write_bytes(b"complete" if succeed else b"partial")
+        return succeed
+    return encode
+
+class CompressToAvifTest(unittest.TestCase):
+    """
+    Tests for compress_to_avif(), which only puts finished encodes in place.
+    """
+
+    def setUp(self) -> None:
+        self._folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self._folder.cleanup)
+        self.png_path = Path(self._folder.name) / "image.png"
+        self.avif_path = Path(self._folder.name) / "image.avif"
+        self.png_path.write_bytes(b"png")
+        patcher = mock.patch.object(ExtractComfyUIWorkflow, "get_avif_encoder", return_value="magick")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def encode(self, succeed: bool) -> bool:
+        """
+        Run compress_to_avif() with a fake encoder.
+
+        Args:
+            succeed (bool): The result the fake encoder reports.
+
+        Returns:
+            bool: The result of compress_to_avif().
+        """
+        with mock.patch.object(ExtractComfyUIWorkflow, "compress_to_avif_magick", side_effect=fake_encoder(succeed)) as encoder:
+            converted = compress_to_avif(self.png_path, self.avif_path)
+        # The encoder never writes to the final name directly
+        self.assertNotEqual(encoder.call_args[0][1], self.avif_path)
+        return converted
+
+    def test_successful_encode_is_put_in_place(self) -> None:
+        self.assertTrue(self.encode(True))
+        self.assertEqual(self.avif_path.read_bytes(), b"complete")
+        self.assertEqual(sorted(p.name for p in Path(self._folder.name).iterdir()), ["image.avif", "image.png"])
+
+    def test_failed_encode_leaves_no_avif(self) -> None:
+        self.assertFalse(self.encode(False))
+        self.assertEqual([p.name for p in Path(self._folder.name).iterdir()], ["image.png"])
+
+    def test_failed_encode_keeps_earlier_avif(self) -> None:
+        self.avif_path.write_bytes(b"earlier")
+        self.assertFalse(self.encode(False))
+        self.assertEqual(self.avif_path.read_bytes(), b"earlier")
+
+if __name__ == "__main__":
+    unittest.main()
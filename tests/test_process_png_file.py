@@ -0,0 +1,120 @@
+import os                        # For setting file modification times
+import sys                       # For making the script importable from this folder
+import tempfile                  # For writing the test files to a temporary folder
+import unittest                  # For the test cases
+from pathlib import Path         # For object-oriented filesystem paths
+from unittest import mock        # For replacing the encoder with a fake one
+
+# The script lives in the repository root rather than in a package
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import ExtractComfyUIWorkflow  # noqa: E402
+from ExtractComfyUIWorkflow import process_png_file  # noqa: E402
+
+# Metadata as read by the metadata stage for an Automatic1111 image
+METADATA = {"Parameters": "a cat, Steps: 20"}
+
+class ProcessPngFileTest(unittest.TestCase):
+    """
+    Tests for process_png_file(), including finishing files an earlier run left behind.
+    """
+
+    def setUp(self) -> None:
+        self._folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self._folder.cleanup)
+        self.root = Path(self._folder.name) / "images"
+        self.review = Path(self._folder.name) / "review"
+        self.root.mkdir()
+        self.review.mkdir()
+        self.png_path = self.root / "image.png"
+        self.avif_path = self.root / "image.avif"
+        self.png_path.write_bytes(b"png")
+        # Silence the progress messages
+        patcher = mock.patch("builtins.print")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def process(self, encode_result: bool = True) -> bool:
+        """
+        Run process_png_file() with a fake encoder.
+
+        Args:
+            encode_result (bool): The result the fake encoder reports; it writes the AVIF file on
+                success.
+
+        Returns:
+            bool: The result of process_png_file().
+        """
+        def encode(png_path: Path, avif_path: Path) -> bool:
+            if encode_result:
+                avif_path.write_bytes(b"encoded")
+            return encode_result
+        with mock.patch.object(ExtractComfyUIWorkflow, "compress_to_avif", side_effect=encode) as self.encoder:
+            return process_png_file(self.png_path, METADATA, self.root, self.review)
+
+    def set_mtime(self, path: Path, seconds: int) -> None:
+        """
+        Set a file's modification time.
+
+        Args:
+            path (Path): Path to the file.
+            seconds (int): The modification time, in seconds since the epoch.
+
+        Returns:
+            None
+        """
+        os.utime(path, (seconds, seconds))
+
+    def names(self, folder: Path) -> list:
+        """
+        List the names of the files in a folder.
+
+        Args:
+            folder (Path): Path to the folder.
+
+        Returns:
+            list: The sorted file names.
+        """
+        return sorted(path.name for path in folder.iterdir())
+
+    def test_converts_saves_and_moves(self) -> None:
+        self.assertTrue(self.process())
+        self.assertEqual(self.names(self.root), ["image.avif", "image.txt"])
+        self.assertEqual(self.names(self.review), ["image.png"])
+        self.assertEqual((self.root / "image.txt").read_text(), METADATA["Parameters"])
+
+    def test_failed_encode_keeps_png(self) -> None:
+        self.assertFalse(self.process(encode_result=False))
+        self.assertEqual(self.names(self.root), ["image.png", "image.txt"])
+        self.assertEqual(self.names(self.review), [])
+
+    def test_resumes_without_encoding(self) -> None:
+        self.avif_path.write_bytes(b"earlier")
+        self.set_mtime(self.png_path, 1000)
+        self.set_mtime(self.avif_path, 2000)
+        self.assertTrue(self.process())
+        self.encoder.assert_not_called()
+        self.assertEqual(self.avif_path.read_bytes(), b"earlier")
+        self.assertEqual(self.names(self.root), ["image.avif", "image.txt"])
+        self.assertEqual(self.names(self.review), ["image.png"])
+
+    def test_resume_keeps_existing_sidecar(self) -> None:
+        self.avif_path.write_bytes(b"earlier")
+        (self.root / "image.txt").write_text("earlier")
+        self.assertTrue(self.process())
+        self.encoder.assert_not_called()
+        self.assertEqual(self.names(self.root), ["image.avif", "image.txt"])
+        self.assertEqual((self.root / "image.txt").read_text(), "earlier")
+        self.assertEqual(self.names(self.review), ["image.png"])
+
+    def test_outdated_avif_is_encoded_again(self) -> None:
+        self.avif_path.write_bytes(b"earlier")
+        self.set_mtime(self.avif_path, 1000)
+        self.set_mtime(self.png_path, 2000)
+        self.assertTrue(self.process())
+        self.encoder.assert_called_once()
+        self.assertEqual(self.avif_path.read_bytes(), b"encoded")
+        self.assertEqual(self.names(self.review), ["image.png"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import struct                    # For packing PNG chunk lengths and header fields
+import sys                       # For making the script importable from this folder
+import tempfile                  # For writing the test images to a temporary folder
+import unittest                  # For the test cases
+import zlib                      # For compressing text and computing chunk CRCs
+from pathlib import Path         # For object-oriented filesystem paths
+
+# The script lives in the repository root rather than in a package
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from ExtractComfyUIWorkflow import PNG_SIGNATURE, read_png_text  # noqa: E402
+
+def make_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """
+    Build a PNG chunk: length, type, data and CRC.
+
+    Args:
+        chunk_type (bytes): The 4-byte chunk type (e.g. b'tEXt').
+        data (bytes): The chunk data.
+
+    Returns:
+        bytes: The encoded chunk.
+    """
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+# A minimal 1x1 RGB header, placed before the text chunks as in real files
+IHDR = make_chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0))
+# The image data and end of the file, placed after the text chunks
+IMAGE_END = make_chunk(b"IDAT", zlib.compress(b"\0\0\0\0")) + make_chunk(b"IEND", b"")
+
+class ReadPngTextTest(unittest.TestCase):
+    """
+    Tests for read_png_text(), the in-process reader of PNG text chunks.
+    """
+
+    def setUp(self) -> None:
+        self._folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self._folder.cleanup)
+
+    def write_png(self, content: bytes) -> Path:
+        """
+        Write a test file and return its path.
+
+        Args:
+            content (bytes): The complete file content.
+
+        Returns:
+            Path: Path to the written file.
+        """
+        path = Path(self._folder.name) / "image.png"
+        path.write_bytes(content)
+        return path
+
+    def test_text_chunk(self) -> None:
+        path = self.write_png(PNG_SIGNATURE + IHDR + make_chunk(b"tEXt", b"workflow\0{\"nodes\": []}") + IMAGE_END)
+        self.assertEqual(read_png_text(path), {"Workflow": "{\"nodes\": []}"})
+
+    def test_text_chunk_is_latin1(self) -> None:
+        path = self.write_png(PNG_SIGNATURE + IHDR + make_chunk(b"tEXt", b"parameters\0caf\xe9") + IMAGE_END)
+        self.assertEqual(read_png_text(path), {"Parameters": "café"})
+
+    def test_compressed_text_chunk(self) -> None:
+        data = b"parameters\0\0" + zlib.compress("a cat, Steps: 20".encode("latin-1"))
+        path = self.write_png(PNG_SIGNATURE + IHDR + make_chunk(b"zTXt", data) + IMAGE_END)
+        self.assertEqual(read_png_text(path), {"Parameters": "a cat, Steps: 20"})
+
+    def test_international_text_chunk(self) -> None:
+        text = "{\"note\": \"✓ ü\"}"
+        data = b"Workflow\0\0\0en\0Workflow\0" + text.encode("utf-8")
+        path = self.write_png(PNG_SIGNATURE + IHDR + make_chunk(b"iTXt", data) + IMAGE_END)
+        self.assertEqual(read_png_text(path), {"Workflow": text})
+
+    def test_compressed_international_text_chunk(self) -> None:
+        text = "{\"note\": \"✓ ü\"}"
+        data = b"workflow\0\1\0\0\0" + zlib.compress(text.encode("utf-8"))
+        path = self.write_png(PNG_SIGNATURE + IHDR + make_chunk(b"iTXt", data) + IMAGE_END)
+        self.assertEqual(read_png_text(path), {"Workflow": text})
+
+    def test_skips_other_keywords_and_keeps_first_occurrence(self) -> None:
+        content = (
+            PNG_SIGNATURE + IHDR
+            + make_chunk(b"tEXt", b"prompt\0" + b"x" * 10000)
+            + make_chunk(b"tEXt", b"workflow\0first")
+            + make_chunk(b"tEXt", b"workflow\0second")
+            + IMAGE_END
+        )
+        self.assertEqual(read_png_text(self.write_png(content)), {"Workflow": "first"})
+
+    def test_ignores_text_after_image_data(self) -> None:
+        content = PNG_SIGNATURE + IHDR + IMAGE_END[:-12] + make_chunk(b"tEXt", b"workflow\0late") + make_chunk(b"IEND", b"")
+        self.assertEqual(read_png_text(self.write_png(content)), {})
+
+    def test_no_text_chunks(self) -> None:
+        self.assertEqual(read_png_text(self.write_png(PNG_SIGNATURE + IHDR + IMAGE_END)), {})
+
+    def test_truncated_file(self) -> None:
+        chunk = make_chunk(b"tEXt", b"workflow\0{\"nodes\": []}")
+        self.assertIsNone(read_png_text(self.write_png(PNG_SIGNATURE + IHDR + chunk[:-6])))
+        self.assertIsNone(read_png_text(self.write_png(PNG_SIGNATURE + IHDR[:10])))
+
+    def test_corrupt_compressed_text(self) -> None:
+        path = self.write_png(PNG_SIGNATURE + IHDR + make_chunk(b"zTXt", b"workflow\0\0not zlib") + IMAGE_END)
+        self.assertIsNone(read_png_text(path))
+
+    def test_not_a_png(self) -> None:
+        self.assertIsNone(read_png_text(self.write_png(b"GIF89a" + b"\0" * 20)))
+
+    def test_missing_file(self) -> None:
+        self.assertIsNone(read_png_text(Path(self._folder.name) / "missing.png"))
+
+if __name__ == "__main__":
+    unittest.main()